@@ -1,12 +1,41 @@
-from fastapi import FastAPI, HTTPException, Depends
-from typing import List
-from pydantic import BaseModel, Field
-from sqlalchemy import create_engine, Column, Integer, String, ForeignKey, Table
-from sqlalchemy.orm import declarative_base, relationship, sessionmaker, Session
-
-DATABASE_URL = 'sqlite:///./fastapi_books.db'
-engine = create_engine(DATABASE_URL, connect_args={'check_same_thread': False})
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+import hashlib
+import os
+import time
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, HTTPException, Depends, Query
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import JSONResponse, ORJSONResponse, Response
+from typing import Generic, List, Optional, TypeVar
+from pydantic import BaseModel, Field, TypeAdapter
+from sqlalchemy import (
+    delete, event, exists, func, insert, select, Column, Integer, String, ForeignKey, Table,
+)
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy.orm import declarative_base, relationship, joinedload, load_only, selectinload
+
+DATABASE_URL = 'sqlite+aiosqlite:///./fastapi_books.db'
+engine = create_async_engine(
+    DATABASE_URL,
+    pool_size=20,
+    max_overflow=40,
+    pool_pre_ping=True,
+    insertmanyvalues_page_size=1000,
+)
+
+
+@event.listens_for(engine.sync_engine, "connect")
+def _sqlite_pragmas(dbapi_connection, _):
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA foreign_keys=ON")
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.execute("PRAGMA synchronous=NORMAL")
+    cursor.execute("PRAGMA temp_store=MEMORY")
+    cursor.execute("PRAGMA mmap_size=268435456")
+    cursor.execute("PRAGMA cache_size=-65536")
+    cursor.close()
+
+
+SessionLocal = async_sessionmaker(engine, autoflush=False, expire_on_commit=False)
 Base = declarative_base()
 
 # SQLAlchemy MODELS
@@ -14,8 +43,9 @@ Base = declarative_base()
 order_products = Table(
     "order_products",
     Base.metadata,
-    Column("order_id", ForeignKey("orders.id"), primary_key=True),
-    Column("product_id", ForeignKey("products.id"), primary_key=True)
+    Column("order_id", ForeignKey("orders.id", ondelete="CASCADE"), primary_key=True),
+    Column("product_id", ForeignKey("products.id", ondelete="CASCADE"), primary_key=True,
+           index=True)
 )
 
 
@@ -24,7 +54,7 @@ class Categories(Base):
     id = Column(Integer, primary_key=True, index=True)
     name = Column(String(128), nullable=False)
 
-    products = relationship("Product", back_populates="category", cascade="all, delete-orphan")
+    products = relationship("Product", back_populates="category", passive_deletes=True)
 
 
 class Product(Base):
@@ -32,7 +62,8 @@ class Product(Base):
     id = Column(Integer, primary_key=True, index=True)
     name = Column(String(128), nullable=False)
     price = Column(Integer, nullable=False)
-    category_id = Column(Integer, ForeignKey("categories.id"), nullable=False)
+    category_id = Column(Integer, ForeignKey("categories.id", ondelete="CASCADE"),
+                         nullable=False, index=True)
 
     category = relationship("Categories", back_populates="products")
     orders = relationship("Orders", secondary=order_products, back_populates="products")
@@ -45,20 +76,19 @@ class Client(Base):
     email = Column(String(128), nullable=False, unique=True)
     password = Column(String(128), nullable=False)
 
-    orders = relationship("Orders", back_populates="client", cascade="all, delete-orphan")
+    orders = relationship("Orders", back_populates="client", passive_deletes=True)
 
 
 class Orders(Base):
     __tablename__ = "orders"
     id = Column(Integer, primary_key=True, index=True)
-    client_id = Column(Integer, ForeignKey("clients.id"), nullable=False)
+    client_id = Column(Integer, ForeignKey("clients.id", ondelete="CASCADE"), nullable=False,
+                       index=True)
 
     client = relationship("Client", back_populates="orders")
     products = relationship("Product", secondary=order_products, back_populates="orders")
 
 
-Base.metadata.create_all(bind=engine)
-
 # Pydantic
 
 class ProductOut(BaseModel):
@@ -118,161 +148,351 @@ class OrderOut(BaseModel):
         from_attributes = True
 
 
+T = TypeVar("T")
+
+
+class Page(BaseModel, Generic[T]):
+    items: List[T]
+    next_cursor: Optional[int] = None
+
+
+# Built once at import so list responses reuse the compiled validators/serializers.
+_categories_adapter = TypeAdapter(Page[CategoryOut])
+_products_adapter = TypeAdapter(Page[ProductOut])
+_clients_adapter = TypeAdapter(Page[ClientOut])
+_orders_adapter = TypeAdapter(Page[OrderOut])
+_product_list_adapter = TypeAdapter(List[ProductOut])
+_order_list_adapter = TypeAdapter(List[OrderOut])
+
+
 # FastApi App
 
-app = FastAPI(title='FastApi Ecommerce')
+class PydanticResponse(JSONResponse):
+    # Serializes the model in one pydantic-core pass instead of jsonable_encoder + json.dumps.
+    def render(self, content: BaseModel) -> bytes:
+        return content.model_dump_json().encode()
+
+
+def adapter_response(adapter: TypeAdapter, data, status_code: int = 200) -> Response:
+    return Response(adapter.dump_json(adapter.validate_python(data)), status_code=status_code,
+                    media_type="application/json")
 
 
-def get_db():
-    db = SessionLocal()
-    try:
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    yield
+    await engine.dispose()
+
+
+app = FastAPI(
+    title='FastApi Ecommerce',
+    default_response_class=ORJSONResponse,
+    lifespan=lifespan,
+)
+
+
+async def get_db():
+    async with SessionLocal() as db:
         yield db
-    finally:
-        db.close()
+
+
+async def paginate(db: AsyncSession, stmt, model, after_id: Optional[int], limit: int):
+    # Keyset pagination on the primary key: seeks the index instead of scanning an OFFSET.
+    if after_id is not None:
+        stmt = stmt.where(model.id > after_id)
+    return (await db.scalars(stmt.order_by(model.id).limit(limit))).all()
+
+
+def page_response(adapter: TypeAdapter, rows, limit: int):
+    next_cursor = rows[-1].id if len(rows) == limit else None
+    return adapter_response(adapter, {"items": rows, "next_cursor": next_cursor})
+
+
+# Per-process cache of serialized category/product list pages. Categories embed
+# their products, so any catalog write clears every entry. The generation
+# counter stops a read that started before a write from caching its old page.
+CATALOG_CACHE_TTL = 60
+CATALOG_CACHE_MAX_ENTRIES = 1024
+_catalog_cache = {}
+_catalog_generation = 0
+
+
+def catalog_generation() -> int:
+    return _catalog_generation
+
+
+def cached_catalog_page(key) -> Optional[Response]:
+    entry = _catalog_cache.get(key)
+    if entry is None:
+        return None
+    if entry[0] < time.monotonic():
+        _catalog_cache.pop(key, None)
+        return None
+    return Response(entry[1], media_type="application/json")
+
+
+def cache_catalog_page(key, generation: int, response: Response) -> Response:
+    if generation != _catalog_generation:
+        return response
+    _catalog_cache.pop(key, None)
+    if len(_catalog_cache) >= CATALOG_CACHE_MAX_ENTRIES:
+        # Dicts keep insertion order, so the first key is the oldest entry.
+        del _catalog_cache[next(iter(_catalog_cache))]
+    _catalog_cache[key] = (time.monotonic() + CATALOG_CACHE_TTL, response.body)
+    return response
+
+
+def invalidate_catalog_cache():
+    global _catalog_generation
+    _catalog_generation += 1
+    _catalog_cache.clear()
+
+
+# Only the columns the Out schemas expose are selected, so reads never load client passwords.
+PRODUCT_OUT_COLUMNS = (Product.id, Product.name, Product.price)
+CLIENT_OUT_COLUMNS = (Client.id, Client.name, Client.email)
+CATEGORY_OUT_OPTIONS = [selectinload(Categories.products).load_only(*PRODUCT_OUT_COLUMNS)]
+ORDER_OUT_OPTIONS = [
+    joinedload(Orders.client).load_only(*CLIENT_OUT_COLUMNS),
+    selectinload(Orders.products).load_only(*PRODUCT_OUT_COLUMNS),
+]
+
+PASSWORD_HASH_ITERATIONS = 600_000
+
+
+def hash_password(password: str) -> str:
+    salt = os.urandom(16)
+    digest = hashlib.pbkdf2_hmac("sha256", password.encode(), salt, PASSWORD_HASH_ITERATIONS)
+    return f"pbkdf2_sha256${PASSWORD_HASH_ITERATIONS}${salt.hex()}${digest.hex()}"
 
 
 #Caregory
 
-@app.get("/api/categories/", response_model=List[CategoryOut])
-def get_categories(db: Session = Depends(get_db)):
-    return db.query(Categories).all()
+@app.get("/api/categories/", response_model=Page[CategoryOut])
+async def get_categories(after_id: Optional[int] = None, limit: int = Query(50, ge=1, le=500),
+                         db: AsyncSession = Depends(get_db)):
+    key = ("categories", after_id, limit)
+    cached = cached_catalog_page(key)
+    if cached is not None:
+        return cached
+    generation = catalog_generation()
+    stmt = select(Categories).options(*CATEGORY_OUT_OPTIONS)
+    rows = await paginate(db, stmt, Categories, after_id, limit)
+    return cache_catalog_page(key, generation, page_response(_categories_adapter, rows, limit))
 
 @app.get("/api/categories/{category_id}", response_model=CategoryOut)
-def get_category_by_id(category_id: int, db: Session = Depends(get_db)):
-    db_category = db.query(Categories).filter(Categories.id == category_id).first()
+async def get_category_by_id(category_id: int, db: AsyncSession = Depends(get_db)):
+    db_category = await db.get(Categories, category_id, options=CATEGORY_OUT_OPTIONS)
     if not db_category:
         raise HTTPException(status_code=404, detail="Category not found")
     return db_category
 
 @app.post("/api/categories/", response_model=CategoryOut, status_code=201)
-def create_category(category: CategoryCreate, db: Session = Depends(get_db)):
-    db_category = Categories(name=category.name)
+async def create_category(category: CategoryCreate, db: AsyncSession = Depends(get_db)):
+    db_category = Categories(name=category.name, products=[])
     db.add(db_category)
-    db.commit()
-    db.refresh(db_category)
+    await db.commit()
+    invalidate_catalog_cache()
     return db_category
 
 @app.delete("/api/categories/{category_id}", status_code=204)
-def delete_category(category_id: int, db: Session = Depends(get_db)):
-    db_category = db.query(Categories).filter_by(id=category_id).first()
-    db.delete(db_category)
-    db.commit()
-    db.refresh(db_category)
+async def delete_category(category_id: int, db: AsyncSession = Depends(get_db)):
+    result = await db.execute(
+        delete(Categories).where(Categories.id == category_id),
+        execution_options={"synchronize_session": False},
+    )
+    await db.commit()
+    if result.rowcount == 0:
+        raise HTTPException(status_code=404, detail="Category not found")
+    invalidate_catalog_cache()
     return None
 
 
 #Product
 
-@app.get("/api/products/", response_model=List[ProductOut])
-def get_products(db: Session = Depends(get_db)):
-    return db.query(Product).all()
+@app.get("/api/products/", response_model=Page[ProductOut])
+async def get_products(after_id: Optional[int] = None, limit: int = Query(50, ge=1, le=500),
+                       db: AsyncSession = Depends(get_db)):
+    key = ("products", after_id, limit)
+    cached = cached_catalog_page(key)
+    if cached is not None:
+        return cached
+    generation = catalog_generation()
+    stmt = select(Product).options(load_only(*PRODUCT_OUT_COLUMNS))
+    rows = await paginate(db, stmt, Product, after_id, limit)
+    return cache_catalog_page(key, generation, page_response(_products_adapter, rows, limit))
 
 
 @app.get("/api/products/{product_id}", response_model=ProductOut)
-def get_products(product_id: int, db: Session = Depends(get_db)):
-    db_product=db.query(Product).filter_by(id=product_id).first()
+async def get_product(product_id: int, db: AsyncSession = Depends(get_db)):
+    db_product = await db.get(Product, product_id, options=[load_only(*PRODUCT_OUT_COLUMNS)])
     if not db_product:
         raise HTTPException(status_code=404, detail="Product not found")
     return db_product
 
 
 @app.post("/api/products/", response_model=ProductOut, status_code=201)
-def create_product(product: ProductCreate, db: Session = Depends(get_db)):
-    category = db.query(Categories).filter(Categories.id == product.category_id).first()
+async def create_product(product: ProductCreate, db: AsyncSession = Depends(get_db)):
+    category = await db.get(Categories, product.category_id)
     if not category:
         raise HTTPException(status_code=404, detail="Category not found")
     db_product = Product(**product.dict())
     db.add(db_product)
-    db.commit()
-    db.refresh(db_product)
+    await db.commit()
+    invalidate_catalog_cache()
     return db_product
 
 
+@app.post("/api/products/bulk", response_model=List[ProductOut], status_code=201)
+async def create_products(products: List[ProductCreate], db: AsyncSession = Depends(get_db)):
+    if not products:
+        return adapter_response(_product_list_adapter, [], status_code=201)
+    category_ids = {product.category_id for product in products}
+    found = await db.scalar(
+        select(func.count()).select_from(Categories).where(Categories.id.in_(category_ids))
+    )
+    if found != len(category_ids):
+        raise HTTPException(status_code=404, detail="Category not found")
+    # insertmanyvalues batches these into multi-row INSERT ... RETURNING statements;
+    # asking for parameter order would make SQLite fall back to one INSERT per row.
+    db_products = (await db.execute(
+        insert(Product).returning(Product.id, Product.name, Product.price),
+        [product.dict() for product in products],
+    )).all()
+    db_products.sort(key=lambda row: row.id)
+    await db.commit()
+    invalidate_catalog_cache()
+    return adapter_response(_product_list_adapter, db_products, status_code=201)
+
+
 @app.delete("/api/products/{product_id}", response_model=ProductOut)
-def delete_product(product_id: int, db: Session = Depends(get_db)):
-    product = db.query(Product).filter(Product.id == product_id).first()
+async def delete_product(product_id: int, db: AsyncSession = Depends(get_db)):
+    product = (await db.execute(
+        delete(Product)
+        .where(Product.id == product_id)
+        .returning(Product.id, Product.name, Product.price),
+        execution_options={"synchronize_session": False},
+    )).first()
     if not product:
         raise HTTPException(status_code=404, detail="Product not found")
-    db.delete(product)
-    db.commit()
-    return product
+    await db.commit()
+    invalidate_catalog_cache()
+    return ProductOut.model_validate(product)
 
 
 #Client
 
-@app.get("/api/clients/", response_model=List[ClientOut])
-def get_clients(db: Session = Depends(get_db)):
-    return db.query(Client).all()
+@app.get("/api/clients/", response_model=Page[ClientOut])
+async def get_clients(after_id: Optional[int] = None, limit: int = Query(50, ge=1, le=500),
+                      db: AsyncSession = Depends(get_db)):
+    stmt = select(Client).options(load_only(*CLIENT_OUT_COLUMNS))
+    rows = await paginate(db, stmt, Client, after_id, limit)
+    return page_response(_clients_adapter, rows, limit)
 
 
 @app.get("/api/clients/{client_id}", response_model=ClientOut)
-def get_client_by_id(client_id: int, db: Session = Depends(get_db)):
-    db_client = db.query(Client).filter(Client.id == client_id).first()
+async def get_client_by_id(client_id: int, db: AsyncSession = Depends(get_db)):
+    db_client = await db.get(Client, client_id, options=[load_only(*CLIENT_OUT_COLUMNS)])
     if not db_client:
         raise HTTPException(status_code=404, detail="Client not found")
     return db_client
 
 @app.get("/api/clients/{client_id}/orders", response_model=List[OrderOut])
-def get_client_orders(client_id: int, db: Session = Depends(get_db)):
-    db_orders = db.query(Orders).filter(Orders.client_id == client_id).all()
+async def get_client_orders(client_id: int, db: AsyncSession = Depends(get_db)):
+    db_orders = (await db.scalars(
+        select(Orders)
+        .where(Orders.client_id == client_id)
+        .options(*ORDER_OUT_OPTIONS)
+    )).all()
     if not db_orders:
         raise HTTPException(status_code=404, detail="No orders found for this client")
-    return db_orders
+    return adapter_response(_order_list_adapter, db_orders)
 
 @app.post("/api/clients/", response_model=ClientOut, status_code=201)
-def create_client(client: ClientCreate, db: Session = Depends(get_db)):
-    db_client = Client(**client.dict())
+async def create_client(client: ClientCreate, db: AsyncSession = Depends(get_db)):
+    # PBKDF2 is deliberately slow; keep it off the event loop.
+    password = await run_in_threadpool(hash_password, client.password)
+    db_client = Client(name=client.name, email=client.email, password=password)
     db.add(db_client)
-    db.commit()
-    db.refresh(db_client)
+    await db.commit()
     return db_client
 
 
 @app.delete("/api/clients/{client_id}", response_model=ClientOut)
-def delete_client(client_id: int, db: Session = Depends(get_db)):
-    client = db.query(Client).filter(Client.id == client_id).first()
+async def delete_client(client_id: int, db: AsyncSession = Depends(get_db)):
+    client = (await db.execute(
+        delete(Client)
+        .where(Client.id == client_id)
+        .returning(Client.id, Client.name, Client.email),
+        execution_options={"synchronize_session": False},
+    )).first()
     if not client:
         raise HTTPException(status_code=404, detail="Client not found")
-    db.delete(client)
-    db.commit()
-    return client
+    await db.commit()
+    return ClientOut.model_validate(client)
 
 
 #Order
 
-@app.get("/api/orders/", response_model=List[OrderOut])
-def get_orders(db: Session = Depends(get_db)):
-    return db.query(Orders).all()
+@app.get("/api/orders/", response_model=Page[OrderOut])
+async def get_orders(after_id: Optional[int] = None, limit: int = Query(50, ge=1, le=500),
+                     db: AsyncSession = Depends(get_db)):
+    stmt = select(Orders).options(*ORDER_OUT_OPTIONS)
+    rows = await paginate(db, stmt, Orders, after_id, limit)
+    return page_response(_orders_adapter, rows, limit)
 
 
 @app.get("/api/orders/{order_id}", response_model=OrderOut)
-def get_order(order_id: int, db: Session = Depends(get_db)):
-    order = db.query(Orders).filter(Orders.id == order_id).first()
+async def get_order(order_id: int, db: AsyncSession = Depends(get_db)):
+    order = await db.get(Orders, order_id, options=ORDER_OUT_OPTIONS)
     if not order:
         raise HTTPException(status_code=404, detail="Order not found")
-    return order
+    return PydanticResponse(OrderOut.model_validate(order))
 
 @app.post("/api/orders/", response_model=OrderOut, status_code=201)
-def create_order(order: OrderCreate, db: Session = Depends(get_db)):
-    db_client = db.query(Client).filter(Client.id == order.client_id).first()
-    if not db_client:
+async def create_order(order: OrderCreate, db: AsyncSession = Depends(get_db)):
+    # order_products has a composite primary key, so each product is linked once.
+    product_ids = list(dict.fromkeys(order.product_ids))
+    # Client and product checks share one round-trip.
+    client_exists, found = (await db.execute(select(
+        exists().where(Client.id == order.client_id),
+        select(func.count())
+        .select_from(Product)
+        .where(Product.id.in_(product_ids))
+        .scalar_subquery(),
+    ))).one()
+    if not client_exists:
         raise HTTPException(status_code=404, detail="Client not found")
-
-    db_products = db.query(Product).filter(Product.id.in_(order.product_ids)).all()
-    if len(db_products) != len(order.product_ids):
+    if found != len(product_ids):
         raise HTTPException(status_code=404, detail="One or more products not found")
 
-    db_order = Orders(client=db_client, products=db_products)
+    db_order = Orders(client_id=order.client_id)
     db.add(db_order)
-    db.commit()
-    db.refresh(db_order)
-    return db_order
+    await db.flush()
+    order_id = db_order.id
+    if product_ids:
+        await db.execute(
+            order_products.insert(),
+            [{"order_id": order_id, "product_id": product_id} for product_id in product_ids],
+        )
+    await db.commit()
+    db_order = await db.get(
+        Orders, order_id,
+        options=ORDER_OUT_OPTIONS,
+        populate_existing=True,
+    )
+    return PydanticResponse(OrderOut.model_validate(db_order), status_code=201)
 
 @app.delete("/api/orders/{order_id}", response_model=OrderOut)
-def delete_order(order_id: int, db: Session = Depends(get_db)):
-    order = db.query(Orders).filter(Orders.id == order_id).first()
+async def delete_order(order_id: int, db: AsyncSession = Depends(get_db)):
+    order = await db.get(Orders, order_id, options=ORDER_OUT_OPTIONS)
     if not order:
         raise HTTPException(status_code=404, detail="Order not found")
-    db.delete(order)
-    db.commit()
-    return order
+    await db.execute(
+        delete(Orders).where(Orders.id == order_id),
+        execution_options={"synchronize_session": False},
+    )
+    await db.commit()
+    return PydanticResponse(OrderOut.model_validate(order))